@@ -1,19 +1,75 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
-import pytesseract
+import msgspec
+from typing import BinaryIO, List, Optional
+import os
+
+# Tesseract's OpenMP threads fight each other when several OCR jobs run at
+# once; one thread per process scales better across cores. This has to be set
+# before the Tesseract library is loaded.
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+from tesserocr import PyTessBaseAPI
 from PIL import Image
-import PyPDF2
+import cv2
+import numpy as np
+import pypdfium2 as pdfium
+import blake3
+import ahocorasick
+from cachetools import LRUCache
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
+import asyncio
+import multiprocessing
 import io
 import re
 import logging
 
+try:
+    # RE2 matches in linear time, so hostile OCR text can't trigger backtracking
+    import re2
+except ImportError:
+    re2 = None
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Health Document Processor", version="1.0.0")
+# Server worker processes, and OCR processes per server worker. Each server
+# worker has its own OCR pool, so by default the total is about one OCR
+# process per CPU. WORKERS is 1 unless set, e.g. under a plain `uvicorn
+# main:app`; `python main.py` sets it to the CPU count for its workers.
+WORKERS = int(os.getenv("WORKERS", 1))
+if WORKERS < 1:
+    raise ValueError("WORKERS must be at least 1")
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", max(1, (os.cpu_count() or 1) // WORKERS)))
+if OCR_WORKERS < 1:
+    raise ValueError("OCR_WORKERS must be at least 1")
+
+# Process pool for OCR, created on startup
+ocr_pool: Optional[ProcessPoolExecutor] = None
+
+def _create_ocr_pool() -> ProcessPoolExecutor:
+    """Create the process pool used for OCR"""
+    # Forking the server, which already runs threadpool and executor threads,
+    # can copy locks held by those threads into the child; start workers from
+    # a clean forkserver process instead
+    return ProcessPoolExecutor(
+        max_workers=OCR_WORKERS,
+        mp_context=multiprocessing.get_context("forkserver"),
+        initializer=_init_ocr_worker
+    )
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global ocr_pool
+    ocr_pool = _create_ocr_pool()
+    yield
+    ocr_pool.shutdown()
+
+app = FastAPI(title="Health Document Processor", version="1.0.0", lifespan=lifespan)
 
 # Add CORS middleware for Next.js frontend
 app.add_middleware(
@@ -24,50 +80,137 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-class HealthParameter(BaseModel):
+class HealthParameter(msgspec.Struct):
     parameter: str
     value: str
     unit: str
     normalRange: str
     isAbnormal: Optional[bool] = None
 
-class ExtractTextResponse(BaseModel):
+class ExtractTextResponse(msgspec.Struct):
     text: str
     success: bool
     message: str
 
-class ParseParametersResponse(BaseModel):
+class ParseParametersResponse(msgspec.Struct):
     parameters: List[HealthParameter]
     success: bool
     message: str
 
-def extract_text_from_image(image_buffer: bytes) -> str:
-    """Extract text from image using OCR"""
+# Tesseract API kept alive for the lifetime of an OCR worker process, so the
+# model is loaded once instead of on every request
+_tess_api: Optional[PyTessBaseAPI] = None
+
+def _get_tess_api() -> PyTessBaseAPI:
+    """Get this process's Tesseract API, creating it on first use"""
+    global _tess_api
+    if _tess_api is None:
+        _tess_api = PyTessBaseAPI(lang='eng')
+    return _tess_api
+
+def _init_ocr_worker():
+    """Initialize an OCR worker process"""
+    # Load all PIL format plugins up front instead of on the first request
+    Image.init()
+    try:
+        _get_tess_api()
+    except RuntimeError as e:
+        # A failing initializer breaks the whole pool; leave the API unset so
+        # the error is reported by the request that needs it instead
+        logger.error(f"Tesseract initialization error: {str(e)}")
+
+# Image formats accepted for OCR; PIL won't probe other decoders
+OCR_IMAGE_FORMATS = ('JPEG', 'PNG', 'TIFF', 'BMP')
+
+# Images whose shorter side is below this are upscaled before OCR, by at most
+# MAX_OCR_UPSCALE and never past MAX_OCR_PIXELS, so thin images can't blow up
+MIN_OCR_IMAGE_SIZE = 1000
+MAX_OCR_UPSCALE = 4
+MAX_OCR_PIXELS = 25_000_000
+
+def _preprocess_image(image: Image.Image) -> Image.Image:
+    """Grayscale, upscale and binarize an image so Tesseract has less to segment"""
+    arr = np.array(image.convert('L'))
+    
+    height, width = arr.shape
+    scale = min(
+        MIN_OCR_IMAGE_SIZE / min(height, width),
+        MAX_OCR_UPSCALE,
+        (MAX_OCR_PIXELS / (height * width)) ** 0.5
+    )
+    if scale > 1:
+        arr = cv2.resize(arr, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+    
+    arr = cv2.adaptiveThreshold(arr, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 10)
+    return Image.fromarray(arr)
+
+def _ocr_image(image_buffer: bytes) -> str:
+    """Run OCR on image bytes inside an OCR worker process"""
     try:
         # Open image from bytes
-        image = Image.open(io.BytesIO(image_buffer))
+        image = Image.open(io.BytesIO(image_buffer), formats=OCR_IMAGE_FORMATS)
         
-        print("Image size:", image)
-        # Use pytesseract to extract text
-        text = pytesseract.image_to_string(image, lang='eng')
+        logger.debug("Image: %s", image)
+        binary_image = _preprocess_image(image)
+        # Drop the decoded full-colour image so only the binarized copy is
+        # held while Tesseract runs
+        del image
         
-        if not text or text.strip() == "":
-            raise ValueError("No text found in image")
-            
-        return text.strip()
+        api = _get_tess_api()
+        api.SetImage(binary_image)
+        text = api.GetUTF8Text()
+    except Exception as e:
+        # Some library exceptions can't be unpickled in the parent process,
+        # which would break the whole pool, so send back a plain error
+        raise RuntimeError(str(e)) from None
+    
+    if not text or text.strip() == "":
+        raise ValueError("No text found in image")
+        
+    return text.strip()
+
+async def extract_text_from_image(image_buffer: bytes) -> str:
+    """Extract text from image using OCR"""
+    global ocr_pool
+    pool = ocr_pool
+    try:
+        # Without the pool, run_in_executor would fall back to threads sharing
+        # this process's single non-thread-safe Tesseract API
+        if pool is None:
+            raise RuntimeError("OCR pool is not running")
+        
+        # Run OCR off the event loop so other requests aren't blocked
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(pool, _ocr_image, image_buffer)
+    except BrokenProcessPool as e:
+        # A worker died (OOM, crash in libtesseract) and the pool is unusable.
+        # Replace it once, even if several requests fail together, so only
+        # the in-flight requests fail.
+        if pool is not None and pool is ocr_pool:
+            logger.error("OCR worker died, restarting the OCR pool")
+            pool.shutdown(wait=False)
+            ocr_pool = _create_ocr_pool()
+        raise HTTPException(status_code=400, detail=f"Failed to extract text from image: {str(e)}")
     except Exception as e:
         logger.error(f"Image OCR error: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Failed to extract text from image: {str(e)}")
 
-def extract_text_from_pdf(pdf_buffer: bytes) -> str:
-    """Extract text from PDF"""
+def extract_text_from_pdf(pdf_file: BinaryIO) -> str:
+    """Extract text from a PDF file object"""
     try:
-        pdf_file = io.BytesIO(pdf_buffer)
-        pdf_reader = PyPDF2.PdfReader(pdf_file)
-        
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
+        pdf_file.seek(0)
+        pdf = pdfium.PdfDocument(pdf_file)
+        try:
+            parts = []
+            for page in pdf:
+                textpage = page.get_textpage()
+                # PDFium separates lines with CRLF; keep plain newlines
+                parts.append((textpage.get_text_bounded() or "").replace("\r\n", "\n"))
+                textpage.close()
+                page.close()
+        finally:
+            pdf.close()
+        text = "\n".join(parts)
         
         if not text or text.strip() == "":
             raise ValueError("No text found in PDF")
@@ -78,128 +221,192 @@ def extract_text_from_pdf(pdf_buffer: bytes) -> str:
         logger.error(f"PDF parsing error: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Failed to extract PDF text: {str(e)}")
 
+# Leading bytes of the document formats we accept
+PDF_MAGIC = b'%PDF-'
+IMAGE_MAGICS = (
+    b'\xff\xd8\xff',       # JPEG
+    b'\x89PNG\r\n\x1a\n',  # PNG
+    b'II*\x00',            # TIFF (little-endian)
+    b'MM\x00*',            # TIFF (big-endian)
+    b'BM',                 # BMP
+)
+
+def detect_document_type(header: bytes) -> Optional[str]:
+    """Detect whether a file is a PDF or an image from its leading bytes"""
+    if header.startswith(PDF_MAGIC):
+        return 'pdf'
+    if header.startswith(IMAGE_MAGICS):
+        return 'image'
+    return None
+
+# Parsed parameters keyed by (endpoint, BLAKE3 hash of the upload), so
+# re-uploads of the same document skip OCR and parsing
+_document_cache: LRUCache = LRUCache(maxsize=1024)
+
+def hash_upload(upload: BinaryIO) -> str:
+    """Hash an uploaded file's contents with BLAKE3"""
+    hasher = blake3.blake3()
+    upload.seek(0)
+    for chunk in iter(lambda: upload.read(1024 * 1024), b""):
+        hasher.update(chunk)
+    upload.seek(0)
+    return hasher.hexdigest()
+
+# Default unit for each parameter
+_UNITS = {
+    'Hemoglobin': 'g/dL',
+    'Glucose': 'mg/dL',
+    'Cholesterol': 'mg/dL',
+    'HDL Cholesterol': 'mg/dL',
+    'LDL Cholesterol': 'mg/dL',
+    'Triglycerides': 'mg/dL',
+    'White Blood Cells': 'K/uL',
+    'Red Blood Cells': 'M/uL',
+    'Platelets': 'K/uL',
+    'Creatinine': 'mg/dL'
+}
+
+# Normal (min, max) range for each parameter; open ends are infinite
+_RANGES = {
+    'Hemoglobin': (12.0, 15.5),
+    'Glucose': (70.0, 100.0),
+    'Cholesterol': (float('-inf'), 200.0),
+    'HDL Cholesterol': (40.0, float('inf')),
+    'LDL Cholesterol': (float('-inf'), 100.0),
+    'Triglycerides': (float('-inf'), 150.0),
+    'White Blood Cells': (4.5, 11.0),
+    'Red Blood Cells': (4.2, 5.4),
+    'Platelets': (150.0, 400.0),
+    'Creatinine': (0.6, 1.2)
+}
+
 def get_default_unit(parameter_name: str) -> str:
     """Get default unit for a parameter"""
-    unit_map = {
-        'Hemoglobin': 'g/dL',
-        'Glucose': 'mg/dL',
-        'Cholesterol': 'mg/dL',
-        'HDL Cholesterol': 'mg/dL',
-        'LDL Cholesterol': 'mg/dL',
-        'Triglycerides': 'mg/dL',
-        'White Blood Cells': 'K/uL',
-        'Red Blood Cells': 'M/uL',
-        'Platelets': 'K/uL',
-        'Creatinine': 'mg/dL'
-    }
-    return unit_map.get(parameter_name, '')
+    return _UNITS.get(parameter_name, '')
 
 def check_if_abnormal(parameter_name: str, value: float) -> bool:
     """Check if a parameter value is abnormal"""
-    ranges = {
-        'Hemoglobin': {'min': 12.0, 'max': 15.5},
-        'Glucose': {'min': 70, 'max': 100},
-        'Cholesterol': {'max': 200},
-        'HDL Cholesterol': {'min': 40},
-        'LDL Cholesterol': {'max': 100},
-        'Triglycerides': {'max': 150},
-        'White Blood Cells': {'min': 4.5, 'max': 11.0},
-        'Red Blood Cells': {'min': 4.2, 'max': 5.4},
-        'Platelets': {'min': 150, 'max': 400},
-        'Creatinine': {'min': 0.6, 'max': 1.2}
-    }
-    
-    range_data = ranges.get(parameter_name)
-    if not range_data:
-        return False
-    
-    if 'min' in range_data and value < range_data['min']:
-        return True
-    if 'max' in range_data and value > range_data['max']:
-        return True
-    
-    return False
+    low, high = _RANGES.get(parameter_name, (None, None))
+    return low is not None and (value < low or value > high)
+
+# Common health parameters with their patterns. The unit is a whole unit
+# token (or nothing), so it can never take the start of the next label or
+# force the number to backtrack when the text doesn't have a known unit.
+_HEALTH_PATTERNS = (
+    ('Hemoglobin', r'\b(?:hemoglobin|hgb|hb)[\s:]*(\d+(?:\.\d+)?)[ \t]*(gm/dl|g/dl)?', '12.0-15.5 g/dL'),
+    ('Glucose', r'\b(?:glucose|blood sugar|sugar)[\s:]*(\d+(?:\.\d+)?)[ \t]*(mg/dl)?', '70-100 mg/dL'),
+    ('Cholesterol', r'\b(?:cholesterol|chol)[\s:]*(\d+(?:\.\d+)?)[ \t]*(mg/dl)?', '<200 mg/dL'),
+    ('HDL Cholesterol', r'\b(?:hdl|hdl cholesterol)[\s:]*(\d+(?:\.\d+)?)[ \t]*(mg/dl)?', '>40 mg/dL'),
+    ('LDL Cholesterol', r'\b(?:ldl|ldl cholesterol)[\s:]*(\d+(?:\.\d+)?)[ \t]*(mg/dl)?', '<100 mg/dL'),
+    ('Triglycerides', r'\b(?:triglycerides|trig)[\s:]*(\d+(?:\.\d+)?)[ \t]*(mg/dl)?', '<150 mg/dL'),
+    ('White Blood Cells', r'\b(?:wbc|white blood cells?)[\s:]*(\d+(?:\.\d+)?)[ \t]*(k/ul)?', '4.5-11.0 K/uL'),
+    ('Red Blood Cells', r'\b(?:rbc|red blood cells?)[\s:]*(\d+(?:\.\d+)?)[ \t]*(m/ul)?', '4.2-5.4 M/uL'),
+    ('Platelets', r'\b(?:platelets|plt)[\s:]*(\d+(?:\.\d+)?)[ \t]*(k/ul)?', '150-400 K/uL'),
+    ('Creatinine', r'\b(?:creatinine|creat)[\s:]*(\d+(?:\.\d+)?)[ \t]*(mg/dl)?', '0.6-1.2 mg/dL'),
+)
+
+def compile_pattern(pattern: str, use_re2: bool = re2 is not None):
+    """Compile a regex with RE2 when it's installed, otherwise with re"""
+    if use_re2:
+        return re2.compile(pattern)
+    # RE2's \b, \d and \s are ASCII-only; use the same classes here. Case
+    # folding still differs: RE2 folds Unicode (e.g. "ſ" matches "s") while
+    # re.ASCII folds ASCII letters only.
+    return re.compile(pattern, re.ASCII)
+
+# All patterns fused into one alternation so the text is scanned in a single
+# pass. Each parameter gets a named group wrapping its own value/unit groups.
+# The inline (?i) flag is used because RE2 takes no re-style flags argument.
+_COMBINED_SOURCE = '(?i)' + '|'.join(
+    f'(?P<p{i}>{regex})' for i, (_, regex, _) in enumerate(_HEALTH_PATTERNS)
+)
+_COMBINED_PATTERN = compile_pattern(_COMBINED_SOURCE)
+_GROUP_NAMES = {f'p{i}': name for i, (name, _, _) in enumerate(_HEALTH_PATTERNS)}
+
+# Keywords that every label of the matching pattern contains, used to check
+# in one pass whether the text can mention a parameter at all
+_PARAMETER_KEYWORDS = (
+    ('Hemoglobin', ('hemoglobin', 'hgb', 'hb')),
+    ('Glucose', ('glucose', 'sugar')),
+    ('Cholesterol', ('chol',)),
+    ('HDL Cholesterol', ('hdl',)),
+    ('LDL Cholesterol', ('ldl',)),
+    ('Triglycerides', ('trig',)),
+    ('White Blood Cells', ('wbc', 'white blood cell')),
+    ('Red Blood Cells', ('rbc', 'red blood cell')),
+    ('Platelets', ('platelets', 'plt')),
+    ('Creatinine', ('creat',)),
+)
+
+def _build_keyword_automaton() -> ahocorasick.Automaton:
+    """Build an Aho-Corasick automaton mapping each keyword to its parameter"""
+    automaton = ahocorasick.Automaton()
+    for name, keywords in _PARAMETER_KEYWORDS:
+        for keyword in keywords:
+            automaton.add_word(keyword, name)
+    automaton.make_automaton()
+    return automaton
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton()
+
+def find_candidate_parameters(text: str) -> set:
+    """Get the parameters whose keywords appear anywhere in the text"""
+    return {name for _, name in _KEYWORD_AUTOMATON.iter(text.lower())}
 
 def parse_health_parameters(text: str) -> List[HealthParameter]:
     """Parse health parameters from extracted text"""
-    parameters = []
+    # Skip the regex scan when no parameter keyword appears in the text
+    candidates = find_candidate_parameters(text)
+    if not candidates:
+        return []
     
-    # Common health parameters with their patterns
-    patterns = [
-        {
-            'name': 'Hemoglobin',
-            'regex': r'(?:hemoglobin|hgb|hb)[\s:]*(\d+\.?\d*)\s*([gmg\/dlmgdl]*)',
-            'normalRange': '12.0-15.5 g/dL'
-        },
-        {
-            'name': 'Glucose',
-            'regex': r'(?:glucose|blood sugar|sugar)[\s:]*(\d+\.?\d*)\s*([mgdlmgdl\/]*)',
-            'normalRange': '70-100 mg/dL'
-        },
-        {
-            'name': 'Cholesterol',
-            'regex': r'(?:cholesterol|chol)[\s:]*(\d+\.?\d*)\s*([mgdlmgdl\/]*)',
-            'normalRange': '<200 mg/dL'
-        },
-        {
-            'name': 'HDL Cholesterol',
-            'regex': r'(?:hdl|hdl cholesterol)[\s:]*(\d+\.?\d*)\s*([mgdlmgdl\/]*)',
-            'normalRange': '>40 mg/dL'
-        },
-        {
-            'name': 'LDL Cholesterol',
-            'regex': r'(?:ldl|ldl cholesterol)[\s:]*(\d+\.?\d*)\s*([mgdlmgdl\/]*)',
-            'normalRange': '<100 mg/dL'
-        },
-        {
-            'name': 'Triglycerides',
-            'regex': r'(?:triglycerides|trig)[\s:]*(\d+\.?\d*)\s*([mgdlmgdl\/]*)',
-            'normalRange': '<150 mg/dL'
-        },
-        {
-            'name': 'White Blood Cells',
-            'regex': r'(?:wbc|white blood cells?)[\s:]*(\d+\.?\d*)\s*([k\/ul]*)',
-            'normalRange': '4.5-11.0 K/uL'
-        },
-        {
-            'name': 'Red Blood Cells',
-            'regex': r'(?:rbc|red blood cells?)[\s:]*(\d+\.?\d*)\s*([m\/ul]*)',
-            'normalRange': '4.2-5.4 M/uL'
-        },
-        {
-            'name': 'Platelets',
-            'regex': r'(?:platelets|plt)[\s:]*(\d+\.?\d*)\s*([k\/ul]*)',
-            'normalRange': '150-400 K/uL'
-        },
-        {
-            'name': 'Creatinine',
-            'regex': r'(?:creatinine|creat)[\s:]*(\d+\.?\d*)\s*([mgdlmgdl\/]*)',
-            'normalRange': '0.6-1.2 mg/dL'
-        }
-    ]
+    found = {}
     
-    for pattern in patterns:
-        matches = re.search(pattern['regex'], text, re.IGNORECASE)
-        if matches and matches.group(1):
-            value = matches.group(1)
-            unit = matches.group(2) if matches.group(2) else get_default_unit(pattern['name'])
-            
-            try:
-                numeric_value = float(value)
-                is_abnormal = check_if_abnormal(pattern['name'], numeric_value)
-            except ValueError:
-                is_abnormal = None
-            
-            parameters.append(HealthParameter(
-                parameter=pattern['name'],
-                value=value,
-                unit=unit,
-                normalRange=pattern['normalRange'],
-                isAbnormal=is_abnormal
-            ))
+    for matches in _COMBINED_PATTERN.finditer(text):
+        name = _GROUP_NAMES[matches.lastgroup]
+        # RE2's case folding is Unicode-aware (e.g. "ſ" matches "s") while the
+        # keyword prefilter only lowercases, so a match can belong to a
+        # parameter that isn't a candidate. Only accept candidates, which
+        # keeps both engines consistent and the early exit below correct.
+        if name in found or name not in candidates:
+            continue
+        # The value and unit groups directly follow the parameter's named group
+        value, unit = matches.group(matches.lastindex + 1), matches.group(matches.lastindex + 2)
+        if value:
+            found[name] = (value, unit)
+            # Only candidates are accepted, so once all of them are found the
+            # rest of the text can't add any
+            if len(found) == len(candidates):
+                break
+    
+    parameters = []
+    for name, _, normal_range in _HEALTH_PATTERNS:
+        if name not in found:
+            continue
+        value, unit = found[name]
+        if not unit:
+            unit = get_default_unit(name)
+        
+        try:
+            numeric_value = float(value)
+            is_abnormal = check_if_abnormal(name, numeric_value)
+        except ValueError:
+            is_abnormal = None
+        
+        parameters.append(HealthParameter(
+            parameter=name,
+            value=value,
+            unit=unit,
+            normalRange=normal_range,
+            isAbnormal=is_abnormal
+        ))
     
     return parameters
 
+def msgspec_response(content: msgspec.Struct) -> Response:
+    """Serialize a response struct to JSON with msgspec"""
+    return Response(content=msgspec.json.encode(content), media_type="application/json")
+
 @app.get("/")
 async def root():
     return {"message": "Health Document Processor API", "version": "1.0.0"}
@@ -208,7 +415,7 @@ async def root():
 async def health_check():
     return {"status": "healthy", "service": "health-document-processor"}
 
-@app.post("/extract-text/image", response_model=ExtractTextResponse)
+@app.post("/extract-text/image")
 async def extract_text_from_image_endpoint(file: UploadFile = File(...)):
     """Extract text from uploaded image file"""
     if not file.content_type or not file.content_type.startswith('image/'):
@@ -216,94 +423,121 @@ async def extract_text_from_image_endpoint(file: UploadFile = File(...)):
     
     try:
         contents = await file.read()
-        text = extract_text_from_image(contents)
+        text = await extract_text_from_image(contents)
         
-        return ExtractTextResponse(
+        return msgspec_response(ExtractTextResponse(
             text=text,
             success=True,
             message="Text extracted successfully from image"
-        )
+        ))
     except Exception as e:
         logger.error(f"Error extracting text from image: {str(e)}")
-        return ExtractTextResponse(
+        return msgspec_response(ExtractTextResponse(
             text="",
             success=False,
             message=f"Failed to extract text from image: {str(e)}"
-        )
+        ))
 
-@app.post("/extract-text/pdf", response_model=ExtractTextResponse)
+@app.post("/extract-text/pdf")
 async def extract_text_from_pdf_endpoint(file: UploadFile = File(...)):
     """Extract text from uploaded PDF file"""
     if not file.content_type or file.content_type != 'application/pdf':
         raise HTTPException(status_code=400, detail="File must be a PDF")
     
     try:
-        contents = await file.read()
-        text = extract_text_from_pdf(contents)
+        # UploadFile is already spooled to a temp file by the multipart
+        # parser, so read from it directly instead of loading it into memory
+        text = extract_text_from_pdf(file.file)
         
-        return ExtractTextResponse(
+        return msgspec_response(ExtractTextResponse(
             text=text,
             success=True,
             message="Text extracted successfully from PDF"
-        )
+        ))
     except Exception as e:
         logger.error(f"Error extracting text from PDF: {str(e)}")
-        return ExtractTextResponse(
+        return msgspec_response(ExtractTextResponse(
             text="",
             success=False,
             message=f"Failed to extract text from PDF: {str(e)}"
-        )
+        ))
 
-@app.post("/parse-parameters", response_model=ParseParametersResponse)
+@app.post("/parse-parameters")
 async def parse_parameters_endpoint(text: str):
     """Parse health parameters from text"""
     try:
         parameters = parse_health_parameters(text)
         
-        return ParseParametersResponse(
+        return msgspec_response(ParseParametersResponse(
             parameters=parameters,
             success=True,
             message=f"Successfully parsed {len(parameters)} health parameters"
-        )
+        ))
     except Exception as e:
         logger.error(f"Error parsing parameters: {str(e)}")
-        return ParseParametersResponse(
+        return msgspec_response(ParseParametersResponse(
             parameters=[],
             success=False,
             message=f"Failed to parse parameters: {str(e)}"
-        )
+        ))
 
-@app.post("/process-document", response_model=ParseParametersResponse)
+@app.post("/process-document")
 async def process_document_endpoint(file: UploadFile = File(...)):
     """Process document (image or PDF) and extract health parameters"""
+    logger.debug("Processing file: %s with content type: %s", file.filename, file.content_type)
+    
+    # Detect the file type from its leading bytes rather than trusting the
+    # client's content type, so a mislabelled file never reaches OCR
+    header = await file.read(8)
+    await file.seek(0)
+    document_type = detect_document_type(header)
+    if document_type is None:
+        raise HTTPException(status_code=415, detail="File must be an image or PDF")
+    
     try:
-        contents = await file.read()
+        # The upload may be spooled to disk; hash it off the event loop
+        cache_key = ("process-document", await run_in_threadpool(hash_upload, file.file))
+        parameters = _document_cache.get(cache_key)
         
-        # Determine file type and extract text
-        print("Processing file:", file.filename, "with content type:", file.content_type)
-        if file.content_type and file.content_type.startswith('image/'):
-            text = extract_text_from_image(contents)
-        elif file.content_type == 'application/pdf':
-            text = extract_text_from_pdf(contents)
-        else:
-            raise HTTPException(status_code=400, detail="File must be an image or PDF")
-        
-        # Parse health parameters
-        parameters = parse_health_parameters(text)
+        if parameters is None:
+            # Extract text based on the detected file type
+            if document_type == 'image':
+                contents = await file.read()
+                text = await extract_text_from_image(contents)
+            else:
+                text = extract_text_from_pdf(file.file)
+            
+            # Parse health parameters
+            parameters = parse_health_parameters(text)
+            _document_cache[cache_key] = parameters
         
-        return ParseParametersResponse(
+        return msgspec_response(ParseParametersResponse(
             parameters=parameters,
             success=True,
             message=f"Successfully processed document and found {len(parameters)} health parameters"
-        )
+        ))
     except Exception as e:
         logger.error(f"Error processing document: {str(e)}")
-        return ParseParametersResponse(
+        return msgspec_response(ParseParametersResponse(
             parameters=[],
             success=False,
             message=f"Failed to process document: {str(e)}"
-        )
+        ))
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    
+    # Server workers re-import this module, so export the worker count for
+    # them to size their OCR pools from
+    workers = int(os.getenv("WORKERS", os.cpu_count() or 1))
+    os.environ["WORKERS"] = str(workers)
+    # Workers need the app as an import string; uvloop and httptools come
+    # with uvicorn[standard]
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=workers,
+        loop="uvloop",
+        http="httptools"
+    )
\ No newline at end of file
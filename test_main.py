@@ -0,0 +1,132 @@
+import pytest
+from cachetools import LRUCache
+from fastapi.testclient import TestClient
+
+import main
+
+ENGINES = [
+    pytest.param(False, id="re"),
+    pytest.param(
+        True,
+        id="re2",
+        marks=pytest.mark.skipif(main.re2 is None, reason="google-re2 not installed"),
+    ),
+]
+
+@pytest.fixture(params=ENGINES)
+def parse(request, monkeypatch):
+    """parse_health_parameters using the combined pattern compiled by each engine"""
+    monkeypatch.setattr(main, "_COMBINED_PATTERN", main.compile_pattern(main._COMBINED_SOURCE, request.param))
+
+    def _parse(text):
+        return [(p.parameter, p.value, p.unit) for p in main.parse_health_parameters(text)]
+
+    return _parse
+
+@pytest.mark.parametrize("text, expected", [
+    (
+        "Hb 13.5\nGlucose 90 mg/dL",
+        [("Hemoglobin", "13.5", "g/dL"), ("Glucose", "90", "mg/dL")],
+    ),
+    (
+        "Cholesterol 180\nLDL 100 mg/dL\nHDL 50",
+        [("Cholesterol", "180", "mg/dL"), ("HDL Cholesterol", "50", "mg/dL"), ("LDL Cholesterol", "100", "mg/dL")],
+    ),
+    (
+        "Hemoglobin: 13.5\nGlucose: 88\nCholesterol: 190\nLDL: 90\nCreatinine: 1.0",
+        [
+            ("Hemoglobin", "13.5", "g/dL"),
+            ("Glucose", "88", "mg/dL"),
+            ("Cholesterol", "190", "mg/dL"),
+            ("LDL Cholesterol", "90", "mg/dL"),
+            ("Creatinine", "1.0", "mg/dL"),
+        ],
+    ),
+    (
+        "Hb 13.5 Glucose 90 WBC 7.1 K/uL",
+        [("Hemoglobin", "13.5", "g/dL"), ("Glucose", "90", "mg/dL"), ("White Blood Cells", "7.1", "K/uL")],
+    ),
+    (
+        "Cholesterol 180 LDL 100 HDL 50",
+        [("Cholesterol", "180", "mg/dL"), ("HDL Cholesterol", "50", "mg/dL"), ("LDL Cholesterol", "100", "mg/dL")],
+    ),
+    (
+        "Glucose 90 LDL 100",
+        [("Glucose", "90", "mg/dL"), ("LDL Cholesterol", "100", "mg/dL")],
+    ),
+])
+def test_multiline_report(parse, text, expected):
+    assert parse(text) == expected
+
+@pytest.mark.parametrize("text, expected", [
+    ("WBC 7.1x10^9/L", [("White Blood Cells", "7.1", "K/uL")]),
+    ("Platelets 250x10^3/uL", [("Platelets", "250", "K/uL")]),
+    ("Glucose 90mmol/L", [("Glucose", "90", "mg/dL")]),
+    ("Hb 12.5gm/dL", [("Hemoglobin", "12.5", "gm/dL")]),
+])
+def test_unit_glued_to_value(parse, text, expected):
+    assert parse(text) == expected
+
+@pytest.mark.parametrize("text, expected", [
+    ("éHb 13", [("Hemoglobin", "13", "g/dL")]),
+    ("Hb ١٢\nGlucose 90", [("Glucose", "90", "mg/dL")]),
+])
+def test_word_boundaries_and_digits_are_ascii(parse, text, expected):
+    assert parse(text) == expected
+
+def test_unicode_case_folding_does_not_stop_scan_early(parse):
+    # RE2 folds "ſ" to "s" but the keyword prefilter doesn't see "glucose"
+    assert parse("Glucoſe 90\nHb 13") == [("Hemoglobin", "13", "g/dL")]
+
+@pytest.mark.parametrize("header, expected", [
+    (b"%PDF-1.7\n", "pdf"),
+    (b"\xff\xd8\xff\xe0\x00\x10JF", "image"),
+    (b"\x89PNG\r\n\x1a\n", "image"),
+    (b"II*\x00\x08\x00\x00\x00", "image"),
+    (b"MM\x00*\x00\x00\x00\x08", "image"),
+    (b"BM6\x00\x00\x00\x00\x00", "image"),
+    (b"GIF89a\x01\x00", None),
+    (b"Hb 13.5", None),
+    (b"", None),
+])
+def test_detect_document_type(header, expected):
+    assert main.detect_document_type(header) == expected
+
+@pytest.fixture
+def client(monkeypatch):
+    """TestClient with an empty document cache and a PDF extractor that counts calls"""
+    calls = []
+
+    def fake_extract_text_from_pdf(pdf_file):
+        calls.append(pdf_file.read())
+        return "Hb 13.5\nGlucose 90"
+
+    monkeypatch.setattr(main, "_document_cache", LRUCache(maxsize=8))
+    monkeypatch.setattr(main, "extract_text_from_pdf", fake_extract_text_from_pdf)
+    client = TestClient(main.app)
+    client.extraction_calls = calls
+    return client
+
+def _process(client, contents, content_type="application/pdf"):
+    return client.post("/process-document", files={"file": ("report.pdf", contents, content_type)})
+
+def test_process_document_cache_hit_skips_extraction(client):
+    first = _process(client, b"%PDF-1.4 report one")
+    second = _process(client, b"%PDF-1.4 report one")
+
+    assert first.json() == second.json()
+    assert [p["parameter"] for p in first.json()["parameters"]] == ["Hemoglobin", "Glucose"]
+    assert client.extraction_calls == [b"%PDF-1.4 report one"]
+
+def test_process_document_cache_miss_on_different_content(client):
+    _process(client, b"%PDF-1.4 report one")
+    _process(client, b"%PDF-1.4 report two")
+
+    assert client.extraction_calls == [b"%PDF-1.4 report one", b"%PDF-1.4 report two"]
+
+def test_process_document_rejects_unknown_magic_bytes(client):
+    response = _process(client, b"Hb 13.5", content_type="application/pdf")
+
+    assert response.status_code == 415
+    assert client.extraction_calls == []
+    assert len(main._document_cache) == 0